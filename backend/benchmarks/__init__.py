@@ -0,0 +1,4 @@
+"""
+Benchmark and load-test suite for the FastAPI backend.
+Runs completely offline against local stubs of bcv.org.ve and Binance P2P.
+"""
@@ -0,0 +1,75 @@
+"""
+Cold-start profile for `import main`
+Runs `python -X importtime -c "import main"` in fresh interpreters and reports the median
+wall time plus the heaviest top-level imports.
+
+Usage (from backend/):
+    python -m benchmarks.import_time
+    python -m benchmarks.import_time --runs 10 --top 15
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def profile_once(module: str, env: dict) -> tuple:
+    """Return (wall seconds, {module: cumulative microseconds}) for one cold import"""
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True,
+    )
+    wall = time.perf_counter() - start
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr[-2000:])
+
+    cumulative = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cum, name = line[len("import time:"):].split("|")
+        if not cum.strip().isdigit():
+            continue
+        # Solo módulos de primer nivel bajo `main` (indentación de dos espacios)
+        if name.startswith("   ") and not name.startswith("    "):
+            cumulative[name.strip()] = int(cum)
+        elif name.strip() == module:
+            cumulative[module] = int(cum)
+    return wall, cumulative
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    tmp_dir = tempfile.mkdtemp(prefix="smartbytes-import-")
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{os.path.join(tmp_dir, 'import.db')}",
+               PYTHONWARNINGS="ignore")
+
+    walls, totals, modules = [], [], {}
+    for _ in range(args.runs):
+        wall, cumulative = profile_once(args.module, env)
+        walls.append(wall)
+        totals.append(cumulative.get(args.module, 0))
+        for name, us in cumulative.items():
+            modules.setdefault(name, []).append(us)
+
+    print(f"import {args.module}: wall {statistics.median(walls) * 1000:.1f} ms, "
+          f"importtime {statistics.median(totals) / 1000:.1f} ms (median of {args.runs})")
+    heaviest = sorted(((statistics.median(v), k) for k, v in modules.items() if k != args.module), reverse=True)
+    for us, name in heaviest[:args.top]:
+        print(f"  {us / 1000:8.1f} ms  {name}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
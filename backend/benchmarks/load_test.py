@@ -0,0 +1,218 @@
+"""
+Load test for the FastAPI backend
+Starts main:app with uvicorn against the offline upstream stubs and a temp-file SQLite DB,
+hits the rate and transaction endpoints at the requested concurrency levels and reports
+throughput plus p50/p95/p99 latency. Results are compared with benchmarks/baselines.json.
+
+Usage (from backend/):
+    python -m benchmarks.load_test
+    python -m benchmarks.load_test --concurrency 1 8 32 --requests 2000
+    python -m benchmarks.load_test --update-baseline
+"""
+import argparse
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from benchmarks.stubs import UpstreamStubs
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines.json")
+
+DEFAULT_ENDPOINTS = ["/tasas", "/api/rates", "/p2p/promedio-usdt-ves", "/transactions/"]
+
+
+# ============================================
+# Server lifecycle
+# ============================================
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(stubs: UpstreamStubs, db_path: str, port: int) -> subprocess.Popen:
+    """Launch uvicorn main:app in a subprocess wired to the stubs and the temp DB"""
+    env = dict(os.environ)
+    # Nunca tocar Supabase real desde un benchmark
+    for var in ("SUPABASE_URL", "SUPABASE_SERVICE_KEY", "SUPABASE_URL_TORO", "SUPABASE_SERVICE_KEY_TORO"):
+        env.pop(var, None)
+    env.update({
+        "DATABASE_URL": f"sqlite:///{db_path}",
+        "BCV_URL": stubs.bcv_url,
+        "BINANCE_P2P_URL": stubs.binance_url,
+        "PYTHONWARNINGS": "ignore",
+    })
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1",
+         "--port", str(port), "--log-level", "warning", "--no-access-log"],
+        cwd=BACKEND_DIR,
+        env=env,
+        stdout=subprocess.DEVNULL,
+    )
+
+
+def wait_until_ready(base_url: str, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(f"{base_url}/ready", timeout=1).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.1)
+    raise RuntimeError(f"El servidor no respondió en {timeout}s")
+
+
+def seed(base_url: str, transactions: int):
+    """Populate rates (through the stubs) and a transaction history"""
+    requests.post(f"{base_url}/api/rates/force-refresh", timeout=30).raise_for_status()
+    types = ["INGRESO", "GASTO", "CXC", "CXP"]
+    with requests.Session() as session:
+        for i in range(transactions):
+            session.post(f"{base_url}/transactions/", json={
+                "type": types[i % len(types)],
+                "amount": round(10 + i * 1.37, 2),
+                "currency": "USD" if i % 3 else "VES",
+                "description": f"Benchmark transaction {i}",
+                "status": "COMPLETADO" if i % 2 else "PENDIENTE",
+            }, timeout=10).raise_for_status()
+
+
+# ============================================
+# Load generation
+# ============================================
+def percentile(sorted_values: list, pct: float) -> float:
+    """Nearest-rank percentile over an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+
+def run_load(url: str, concurrency: int, total_requests: int, warmup: int = 20) -> dict:
+    """Closed-loop load: `concurrency` workers share `total_requests` GETs"""
+    with requests.Session() as session:
+        for _ in range(warmup):
+            session.get(url, timeout=30)
+
+    per_worker = [total_requests // concurrency + (1 if i < total_requests % concurrency else 0)
+                  for i in range(concurrency)]
+
+    def worker(count: int):
+        latencies, errors = [], 0
+        with requests.Session() as session:
+            for _ in range(count):
+                start = time.perf_counter()
+                try:
+                    response = session.get(url, timeout=30)
+                    if response.status_code >= 400:
+                        errors += 1
+                except requests.RequestException:
+                    errors += 1
+                latencies.append(time.perf_counter() - start)
+        return latencies, errors
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(worker, per_worker))
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(l for lats, _ in results for l in lats)
+    errors = sum(e for _, e in results)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+    }
+
+
+# ============================================
+# Baselines
+# ============================================
+def load_baselines(path: str) -> dict:
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare(result: dict, baseline: dict, tolerance: float) -> list:
+    """Return the list of regressions of `result` against `baseline`"""
+    regressions = []
+    if baseline.get("rps") and result["rps"] < baseline["rps"] * (1 - tolerance):
+        regressions.append(f"rps {result['rps']} < {baseline['rps']}")
+    for key in ("p95_ms", "p99_ms"):
+        if baseline.get(key) and result[key] > baseline[key] * (1 + tolerance):
+            regressions.append(f"{key} {result[key]} > {baseline[key]}")
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--endpoints", nargs="+", default=DEFAULT_ENDPOINTS)
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=1000, help="Peticiones por endpoint y nivel de concurrencia")
+    parser.add_argument("--transactions", type=int, default=500, help="Transacciones sembradas antes de medir")
+    parser.add_argument("--baseline", default=BASELINES_PATH)
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Degradación tolerada antes de marcar regresión")
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args(argv)
+
+    tmp_dir = tempfile.mkdtemp(prefix="smartbytes-bench-")
+    port = _free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    results = {}
+
+    with UpstreamStubs() as stubs:
+        server = start_server(stubs, os.path.join(tmp_dir, "bench.db"), port)
+        try:
+            wait_until_ready(base_url)
+            seed(base_url, args.transactions)
+            print(f"{'endpoint':<28}{'conc':>6}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}")
+            for endpoint in args.endpoints:
+                for concurrency in args.concurrency:
+                    result = run_load(f"{base_url}{endpoint}", concurrency, args.requests)
+                    results[f"{endpoint}@{concurrency}"] = result
+                    print(f"{endpoint:<28}{concurrency:>6}{result['rps']:>10}{result['p50_ms']:>10}"
+                          f"{result['p95_ms']:>10}{result['p99_ms']:>10}{result['errors']:>8}")
+        finally:
+            server.terminate()
+            server.wait(timeout=10)
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    if args.update_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Baseline actualizado: {args.baseline}")
+        return 0
+
+    baselines = load_baselines(args.baseline)
+    failed = False
+    for key, result in results.items():
+        if result["errors"]:
+            print(f"❌ {key}: {result['errors']} errores")
+            failed = True
+        regressions = compare(result, baselines.get(key, {}), args.tolerance)
+        if regressions:
+            print(f"⚠️  Regresión en {key}: {', '.join(regressions)}")
+            failed = True
+    if not baselines:
+        print("No hay baseline guardado; ejecuta con --update-baseline para crearlo.")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
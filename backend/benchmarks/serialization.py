@@ -0,0 +1,66 @@
+"""
+Rows/sec of GET /transactions/ with the ORM + Pydantic path versus the fast JSON path
+Runs the app in-process (TestClient) over a temp-file SQLite DB seeded with N transactions
+and toggles fast_json.ENABLED between runs.
+
+Usage (from backend/):
+    python -m benchmarks.serialization
+    python -m benchmarks.serialization --rows 5000 --requests 50
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import warnings
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--requests", type=int, default=30)
+    args = parser.parse_args(argv)
+
+    tmp_dir = tempfile.mkdtemp(prefix="smartbytes-serial-")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp_dir, 'serial.db')}"
+    warnings.simplefilter("ignore")
+
+    from fastapi.testclient import TestClient
+    import fast_json
+    import main as app_module
+
+    database = app_module.get_database()
+    db = database.SessionLocal()
+    try:
+        db.add_all(database.Transaction(
+            type=("INGRESO", "GASTO", "CXC", "CXP")[i % 4], amount=round(10 + i * 1.37, 2),
+            currency="USD", description=f"Transacción de prueba {i}", status="COMPLETADO",
+            code=f"BENCH-{i:06d}") for i in range(args.rows))
+        db.commit()
+    finally:
+        db.close()
+
+    client = TestClient(app_module.app)
+    results = {}
+    bodies = {}
+    encoder = "orjson" if fast_json.orjson is not None else "json (stdlib)"
+    for label, enabled in (("orm+pydantic", False), (f"fast ({encoder})", True)):
+        fast_json.ENABLED = enabled
+        bodies[label] = client.get("/transactions/").json()
+        start = time.perf_counter()
+        for _ in range(args.requests):
+            client.get("/transactions/").raise_for_status()
+        elapsed = time.perf_counter() - start
+        results[label] = args.rows * args.requests / elapsed
+
+    slow, fast = bodies.values()
+    print(f"{args.rows} filas x {args.requests} peticiones (respuestas idénticas: {slow == fast})")
+    for label, rows_per_s in results.items():
+        print(f"  {label:<24}{rows_per_s:>12,.0f} rows/s")
+    baseline = next(iter(results.values()))
+    print(f"  speedup: {list(results.values())[-1] / baseline:.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
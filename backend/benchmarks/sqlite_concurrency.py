@@ -0,0 +1,120 @@
+"""
+Concurrent read/write throughput of the SQLite backend
+Compares the previous engine setup (default journal, only check_same_thread=False) with the
+tuned profile from database.create_db_engine (WAL + pragmas + QueuePool). Readers mimic
+/api/rates and /transactions/, writers mimic save_rates_to_sqlite and create_transaction.
+
+Usage (from backend/):
+    python -m benchmarks.sqlite_concurrency
+    python -m benchmarks.sqlite_concurrency --readers 16 --writers 4 --duration 10
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy.orm import sessionmaker
+
+from database import Base, ExchangeRate, Transaction, create_db_engine
+
+
+def _seed(Session, transactions: int):
+    db = Session()
+    try:
+        db.add_all(Transaction(type="GASTO", amount=i, code=f"SEED-{i}", status="COMPLETADO")
+                   for i in range(transactions))
+        db.add(ExchangeRate(usd_bcv=36.5, eur_bcv=41.8, last_updated=datetime.utcnow()))
+        db.commit()
+    finally:
+        db.close()
+
+
+def _reader(Session, stop: threading.Event, counters: dict, lock: threading.Lock):
+    ops = errors = 0
+    while not stop.is_set():
+        db = Session()
+        try:
+            db.query(ExchangeRate).order_by(ExchangeRate.last_updated.desc()).first()
+            db.query(Transaction).order_by(Transaction.created_at.desc()).limit(100).all()
+            ops += 1
+        except Exception:
+            errors += 1
+        finally:
+            db.close()
+    with lock:
+        counters["reads"] += ops
+        counters["read_errors"] += errors
+
+
+def _writer(Session, stop: threading.Event, counters: dict, lock: threading.Lock, worker_id: int):
+    ops = errors = 0
+    while not stop.is_set():
+        db = Session()
+        try:
+            db.add(ExchangeRate(usd_bcv=36.5 + ops * 1e-4, eur_bcv=41.8, last_updated=datetime.utcnow()))
+            db.add(Transaction(type="INGRESO", amount=ops, code=f"W{worker_id}-{ops}"))
+            db.commit()
+            ops += 1
+        except Exception:
+            db.rollback()
+            errors += 1
+        finally:
+            db.close()
+    with lock:
+        counters["writes"] += ops
+        counters["write_errors"] += errors
+
+
+def run(tuned: bool, readers: int, writers: int, duration: float, seed_rows: int) -> dict:
+    tmp_dir = tempfile.mkdtemp(prefix="smartbytes-sqlite-")
+    engine = create_db_engine(f"sqlite:///{os.path.join(tmp_dir, 'bench.db')}", tuned=tuned)
+    try:
+        Base.metadata.create_all(bind=engine)
+        Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        _seed(Session, seed_rows)
+
+        counters = {"reads": 0, "writes": 0, "read_errors": 0, "write_errors": 0}
+        lock = threading.Lock()
+        stop = threading.Event()
+        threads = [threading.Thread(target=_reader, args=(Session, stop, counters, lock)) for _ in range(readers)]
+        threads += [threading.Thread(target=_writer, args=(Session, stop, counters, lock, i)) for i in range(writers)]
+        for t in threads:
+            t.start()
+        time.sleep(duration)
+        stop.set()
+        for t in threads:
+            t.join()
+
+        return {
+            "reads_per_s": round(counters["reads"] / duration, 1),
+            "writes_per_s": round(counters["writes"] / duration, 1),
+            "read_errors": counters["read_errors"],
+            "write_errors": counters["write_errors"],
+        }
+    finally:
+        engine.dispose()
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=2)
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--seed-rows", type=int, default=1000)
+    args = parser.parse_args(argv)
+
+    print(f"{args.readers} lectores / {args.writers} escritores durante {args.duration}s")
+    print(f"{'profile':<10}{'reads/s':>12}{'writes/s':>12}{'read err':>10}{'write err':>11}")
+    for label, tuned in (("default", False), ("tuned", True)):
+        r = run(tuned, args.readers, args.writers, args.duration, args.seed_rows)
+        print(f"{label:<10}{r['reads_per_s']:>12}{r['writes_per_s']:>12}{r['read_errors']:>10}{r['write_errors']:>11}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
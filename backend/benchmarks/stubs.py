@@ -0,0 +1,102 @@
+"""
+Offline upstream stubs for benchmarks
+Replays the saved BCV HTML page and Binance P2P JSON responses from fixtures/
+"""
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def _read_fixture(name: str) -> bytes:
+    with open(os.path.join(FIXTURES_DIR, name), "rb") as f:
+        return f.read()
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    """Serves GET / as the BCV home page and POST /bapi/... as the Binance P2P search"""
+    protocol_version = "HTTP/1.1"
+
+    def _send(self, status: int, body: bytes, content_type: str):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self._send(200, self.server.bcv_html, "text/html; charset=utf-8")
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            payload = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            payload = {}
+        trade_type = payload.get("tradeType", "BUY")
+        body = self.server.binance_json.get(trade_type, self.server.binance_json["BUY"])
+        self._send(200, body, "application/json")
+
+    def log_message(self, format, *args):
+        # Silenciar el log por petición: ensucia la salida del benchmark
+        pass
+
+
+class UpstreamStubs:
+    """
+    Local HTTP server standing in for both upstreams.
+
+    Usage:
+        with UpstreamStubs() as stubs:
+            env["BCV_URL"] = stubs.bcv_url
+            env["BINANCE_P2P_URL"] = stubs.binance_url
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        self.server = ThreadingHTTPServer((host, port), _StubHandler)
+        self.server.daemon_threads = True
+        self.server.bcv_html = _read_fixture("bcv.html")
+        self.server.binance_json = {
+            "BUY": _read_fixture("binance_p2p_buy.json"),
+            "SELL": _read_fixture("binance_p2p_sell.json"),
+        }
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def bcv_url(self) -> str:
+        return f"{self.base_url}/"
+
+    @property
+    def binance_url(self) -> str:
+        return f"{self.base_url}/bapi/c2c/v2/friendly/c2c/adv/search"
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == "__main__":
+    with UpstreamStubs(port=int(os.getenv("STUB_PORT", "8900"))) as stubs:
+        print(f"BCV_URL={stubs.bcv_url}")
+        print(f"BINANCE_P2P_URL={stubs.binance_url}")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            pass
@@ -1,15 +1,29 @@
-import requests
 import json
+import os
+from resilience import UpstreamGuard, UpstreamUnavailableError
 
-# URL de la API interna de Binance P2P
-API_URL = "https://p2p.binance.com/bapi/c2c/v2/friendly/c2c/adv/search"
+# URL de la API interna de Binance P2P (sobrescribible para pruebas/benchmarks)
+API_URL = os.getenv("BINANCE_P2P_URL", "https://p2p.binance.com/bapi/c2c/v2/friendly/c2c/adv/search")
 
-def obtener_precios_p2p(trade_type: str) -> list[float]:
+# Circuit breaker + rate limiter frente a Binance (cada refresco hace 2 llamadas: BUY y SELL)
+binance_guard = UpstreamGuard.from_env("binance_p2p", "BINANCE_GUARD", rate_per_minute=30, burst=4)
+
+def _post(url: str, **kwargs):
+    import requests
+
+    response = requests.post(url, **kwargs)
+    response.raise_for_status()
+    # Dentro del guard: una respuesta que no es JSON también cuenta como fallo
+    return response.json()
+
+def obtener_anuncios_p2p(trade_type: str) -> list[tuple[float, float]]:
     """
-    Realiza una petición a la API interna de Binance P2P para obtener los precios.
+    Realiza una petición a la API interna de Binance P2P para obtener precio y cantidad de cada anuncio.
     :param trade_type: 'BUY' para anuncios de compra de USDT o 'SELL' para anuncios de venta de USDT.
-    :return: Una lista de precios como números flotantes.
+    :return: Una lista de tuplas (precio, cantidad USDT disponible).
     """
+    import requests  # import diferido: solo se carga al primer scraping
+
     payload = {
         "asset": "USDT",
         "fiat": "VES",
@@ -27,32 +41,29 @@ def obtener_precios_p2p(trade_type: str) -> list[float]:
     }
     
     try:
-        response = requests.post(API_URL, headers=headers, data=json.dumps(payload), timeout=10)
-        response.raise_for_status()
+        data = binance_guard.call(_post, API_URL, headers=headers, data=json.dumps(payload), timeout=10)
         
-        data = response.json()
-        precios = []
+        resultado = []
         
         if data and 'data' in data:
             # Empezamos desde la SEGUNDA posición (índice 1) para evitar el anuncio patrocinado.
-            # Tomamos hasta 5 anuncios.
-            anuncios = data['data'][1:6] 
+            anuncios = data['data'][1:]
             
             for anuncio in anuncios:
-                precio = float(anuncio['adv']['price'])
-                precios.append(precio)
+                adv = anuncio['adv']
+                precio = float(adv['price'])
+                cantidad = float(adv.get('tradableQuantity') or adv.get('surplusAmount') or 0)
+                resultado.append((precio, cantidad))
                 
-        return precios
+        return resultado
     
+    except UpstreamUnavailableError as e:
+        # Falla rápida: quien llama sirve su último valor en caché
+        print(f"Binance P2P omitido para {trade_type}: {e}")
+        return []
     except requests.exceptions.RequestException as e:
         print(f"Error al realizar la petición API para {trade_type}: {e}")
         return []
     except (KeyError, TypeError, ValueError) as e:
         print(f"Error al parsear la respuesta JSON para {trade_type}: {e}")
         return []
-
-def calcular_promedio(precios: list[float]) -> float:
-    """Calcula el promedio de una lista de precios."""
-    if not precios:
-        return 0.0
-    return sum(precios) / len(precios)
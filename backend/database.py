@@ -2,9 +2,10 @@
 Database models and operations for exchange rates persistence
 Supports both Supabase (primary) and SQLite (fallback)
 """
-from sqlalchemy import create_engine, Column, Integer, Float, String, DateTime
+from sqlalchemy import create_engine, event, select, Column, Integer, Float, String, DateTime
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool, StaticPool
 from datetime import datetime
 import os
 from supabase_config import get_supabase_client, is_supabase_enabled, RAILWAY_RATES_ID
@@ -18,7 +19,60 @@ DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./exchange_rates_v2.db")
 if DATABASE_URL and DATABASE_URL.startswith("postgres://"):
     DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
 
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False} if "sqlite" in DATABASE_URL else {})
+# ============================================
+# SQLite Performance Profile
+# ============================================
+# WAL permite lecturas concurrentes mientras save_rates_to_sqlite / create_transaction escriben.
+SQLITE_TUNING = os.getenv("SQLITE_TUNING", "true").lower() not in ("0", "false", "no")
+SQLITE_POOL_SIZE = int(os.getenv("SQLITE_POOL_SIZE", "10"))
+SQLITE_MAX_OVERFLOW = int(os.getenv("SQLITE_MAX_OVERFLOW", "20"))
+
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",                                       # seguro con WAL, sin fsync por commit
+    "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", "268435456")),  # 256 MB
+    "cache_size": int(os.getenv("SQLITE_CACHE_SIZE", "-65536")),   # negativo = KiB (64 MB)
+    "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000")),
+    "temp_store": "MEMORY",
+}
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    """Engine connect hook: apply SQLITE_PRAGMAS to every new DBAPI connection"""
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+    finally:
+        cursor.close()
+
+def create_db_engine(url: str, tuned: bool = SQLITE_TUNING):
+    """
+    Create the SQLAlchemy engine for `url`
+
+    Args:
+        url: Database URL
+        tuned: Apply the SQLite performance profile (WAL, pragmas, pooled connections)
+
+    Returns:
+        Engine
+    """
+    if "sqlite" not in url:
+        return create_engine(url)
+
+    kwargs = {"connect_args": {"check_same_thread": False}}
+    if url in ("sqlite://", "sqlite:///:memory:"):
+        # In-memory: una sola conexión compartida o cada hilo vería una BD vacía
+        kwargs["poolclass"] = StaticPool
+    elif tuned:
+        # Conexiones reutilizables entre los hilos del executor de FastAPI
+        kwargs.update(poolclass=QueuePool, pool_size=SQLITE_POOL_SIZE, max_overflow=SQLITE_MAX_OVERFLOW)
+
+    engine = create_engine(url, **kwargs)
+    if tuned:
+        event.listen(engine, "connect", _apply_sqlite_pragmas)
+    return engine
+
+engine = create_db_engine(DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
@@ -134,6 +188,21 @@ def get_rates_from_supabase() -> dict:
 # ============================================
 # SQLite Operations (Fallback)
 # ============================================
+# Callbacks invoked with each ExchangeRate saved to SQLite (in-process history, analytics)
+_rate_listeners = []
+
+def add_rate_listener(callback):
+    """Register `callback(rate: ExchangeRate)` to run after every successful SQLite save"""
+    if callback not in _rate_listeners:
+        _rate_listeners.append(callback)
+
+def _notify_rate_listeners(rate):
+    for callback in _rate_listeners:
+        try:
+            callback(rate)
+        except Exception as e:
+            print(f"⚠️  Rate listener {getattr(callback, '__name__', callback)} failed: {e}")
+
 def get_db():
     """Get database session"""
     db = SessionLocal()
@@ -168,6 +237,7 @@ def save_rates_to_sqlite(usd_bcv: float, eur_bcv: float, usd_binance_buy: float
         db.commit()
         db.refresh(rate)
         print(f"✅ Rates saved to SQLite: USD={usd_bcv}, EUR={eur_bcv}")
+        _notify_rate_listeners(rate)
         return rate
     except Exception as e:
         db.rollback()
@@ -212,6 +282,34 @@ def get_rates_dict_from_sqlite():
         }
     return None
 
+# ============================================
+# Transaction Operations
+# ============================================
+# Columnas expuestas por TransactionResponse (mismo orden que el schema)
+TRANSACTION_RESPONSE_FIELDS = ("id", "code", "type", "amount", "currency", "description", "status", "created_at")
+
+def list_transaction_rows(type: str = None, status: str = None) -> list:
+    """
+    List transactions as plain dicts using a column-only query (no ORM identity map)
+
+    Args:
+        type: Optional filter by transaction type
+        status: Optional filter by status
+
+    Returns:
+        list of dicts with TRANSACTION_RESPONSE_FIELDS, newest first
+    """
+    columns = [getattr(Transaction, field) for field in TRANSACTION_RESPONSE_FIELDS]
+    stmt = select(*columns)
+    if type:
+        stmt = stmt.where(Transaction.type == type)
+    if status:
+        stmt = stmt.where(Transaction.status == status)
+    stmt = stmt.order_by(Transaction.created_at.desc())
+
+    with engine.connect() as conn:
+        return [dict(zip(TRANSACTION_RESPONSE_FIELDS, row)) for row in conn.execute(stmt)]
+
 # ============================================
 # Unified Interface (Auto-selects Supabase or SQLite)
 # ============================================
@@ -0,0 +1,40 @@
+"""
+Fast JSON serialization for high-volume endpoints
+Uses orjson (C-accelerated) when installed and falls back to the stdlib encoder.
+"""
+import json
+import os
+from datetime import date, datetime
+
+from fastapi import Response
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Ruta rápida activa salvo FAST_JSON=false (con o sin orjson se evita la validación por fila)
+ENABLED = os.getenv("FAST_JSON", "true").lower() not in ("0", "false", "no")
+
+
+def _default(obj):
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(obj) -> bytes:
+    """
+    Serialize `obj` to compact UTF-8 JSON (same output format as Starlette's JSONResponse)
+    """
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=_default).encode("utf-8")
+
+
+class FastJSONResponse(Response):
+    """JSONResponse that renders with `dumps`"""
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return dumps(content)
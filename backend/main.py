@@ -1,25 +1,24 @@
-import requests
 import os
-from bs4 import BeautifulSoup
-from fastapi import FastAPI, HTTPException
+import asyncio
+import threading
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel
-import asyncio
-from binance_scraper import obtener_precios_p2p, calcular_promedio
-from database import init_db, save_rates, get_rates_dict, get_latest_rates
-from apscheduler.schedulers.asyncio import AsyncIOScheduler
-from apscheduler.triggers.interval import IntervalTrigger
-from apscheduler.triggers.cron import CronTrigger
-from apscheduler.triggers.date import DateTrigger
+from binance_scraper import binance_guard
+from p2p_aggregator import agregador_p2p, Estimador, ESTIMADOR_PUBLICADO
+from resilience import UpstreamGuard, UpstreamUnavailableError
+from response_cache import LRUCache, SnapshotResponseCache
+from spread_analytics import SPREAD_CACHE_SIZE
+import fast_json
 from datetime import datetime, timedelta
-import pytz
+from typing import List, Optional
 
-# --- INTEGRACIÓN SMART BYTES (Supabase) ---
-try:
-    from supabase import create_client
-except ImportError:
-    print("Advertencia: Libreria 'supabase' no encontrada. La sincronizacion fallara.")
+# NOTA DE ARRANQUE: supabase, bs4, requests, apscheduler y SQLAlchemy (vía `database`)
+# se importan en el primer uso. Así el proceso abre el puerto rápido y /ready indica
+# cuándo las dependencias ya están cargadas.
 
+# --- INTEGRACIÓN SMART BYTES (Supabase) ---
 def sync_to_smart_bytes(usd_bcv=None, eur_bcv=None, usd_buy=None, usd_sell=None):
     """
     Envía las tasas a la base de datos central de Smart Bytes (Supabase)
@@ -32,6 +31,12 @@ def sync_to_smart_bytes(usd_bcv=None, eur_bcv=None, usd_buy=None, usd_sell=None)
         # Si no hay credenciales configuradas, asumimos que no se quiere sincronizar
         return
 
+    try:
+        from supabase import create_client
+    except ImportError:
+        print("Advertencia: Libreria 'supabase' no encontrada. La sincronizacion fallara.")
+        return
+
     try:
         sb = create_client(url, key)
         now = datetime.utcnow().isoformat()
@@ -54,11 +59,11 @@ def sync_to_smart_bytes(usd_bcv=None, eur_bcv=None, usd_buy=None, usd_sell=None)
 
 # ----------------------------------------------
 
-# Configurar zona horaria de Venezuela
-VENEZUELA_TZ = pytz.timezone('America/Caracas')
+# URL objetivo para el scraping (sobrescribible para pruebas/benchmarks)
+BCV_URL = os.getenv("BCV_URL", "https://www.bcv.org.ve/")
 
-# URL objetivo para el scraping
-BCV_URL = "https://www.bcv.org.ve/"
+# Circuit breaker + rate limiter frente al BCV: si está caído se sirve la caché sin esperar el timeout
+bcv_guard = UpstreamGuard.from_env("bcv", "BCV_GUARD", rate_per_minute=6, burst=3)
 
 # Cache para almacenar la última tasa y su fecha de actualización.
 rates_cache = {
@@ -68,17 +73,88 @@ rates_cache = {
     "cache_duration_hours": 4 
 }
 
+# Horas en las que el BCV publica y se ignora la caché. Se comparan con datetime.now(),
+# es decir, con la hora local del servidor: desplegar con TZ=America/Caracas.
+BCV_UPDATE_HOURS = [6, 19, 20, 21]
+
+# Cache-Control de /api/rates: la BD la alimenta un servicio externo en cualquier momento,
+# así que el max-age es corto y el resto del TTL se cubre con stale-while-revalidate.
+RATES_API_MAX_AGE = int(os.getenv("RATES_API_MAX_AGE", "60"))
+
+# Respuestas pre-serializadas + ETag por endpoint
+tasas_response_cache = SnapshotResponseCache()
+rates_api_response_cache = SnapshotResponseCache()
+
 app = FastAPI(
     title="BCV Rate Scraper API",
     description="API que obtiene las tasas del dólar (USD) y euro (EUR) del Banco Central de Venezuela (BCV) con persistencia en base de datos.",
     version="2.0.0"
 )
 
-# Initialize database on startup
-init_db()
+# ============================================
+# Inicialización diferida (cold start rápido)
+# ============================================
+# Crear tablas al cargar la BD por primera vez. En despliegues con migración explícita
+# (`python database.py`) se puede desactivar con AUTO_INIT_DB=false.
+AUTO_INIT_DB = os.getenv("AUTO_INIT_DB", "true").lower() not in ("0", "false", "no")
+
+_database = None
+_database_lock = threading.Lock()
+_warm_up_future = None
+
+# Estado expuesto por /ready
+readiness = {
+    "ready": False,
+    "database": False,
+    "scraper": False,
+    "error": None,
+    "started_at": datetime.utcnow().isoformat(),
+    "ready_at": None
+}
+
+def get_database():
+    """
+    Importa el módulo `database` (SQLAlchemy, Supabase) en el primer uso
+    y crea las tablas una única vez si AUTO_INIT_DB está activo.
+    """
+    global _database
+    if _database is None:
+        with _database_lock:
+            if _database is None:
+                import database
+                if AUTO_INIT_DB:
+                    database.init_db()
+                _database = database
+    return _database
+
+def warm_up():
+    """
+    Precarga las dependencias pesadas en segundo plano tras el arranque.
+    """
+    try:
+        get_database()
+        readiness["database"] = True
+
+        import requests  # noqa: F401
+        import bs4  # noqa: F401
+        readiness["scraper"] = True
+
+        readiness["ready"] = True
+        readiness["ready_at"] = datetime.utcnow().isoformat()
+        print("[SYSTEM] Dependencias precargadas. Servicio listo.")
+    except Exception as e:
+        readiness["error"] = str(e)
+        print(f"[SYSTEM] Error precargando dependencias: {e}")
+
+# Scheduler (se crea bajo demanda para no importar apscheduler al arrancar)
+scheduler = None
 
-# Initialize scheduler
-scheduler = AsyncIOScheduler()
+def get_scheduler():
+    global scheduler
+    if scheduler is None:
+        from apscheduler.schedulers.asyncio import AsyncIOScheduler
+        scheduler = AsyncIOScheduler()
+    return scheduler
 
 # Configurar CORS
 app.add_middleware(
@@ -91,22 +167,41 @@ app.add_middleware(
 
 @app.get("/", tags=["Info"])
 def read_root():
-    return {"status": "online", "message": "Smart Bytes Financial Backend is running", "endpoints": ["/tasas", "/api/rates", "/docs"]}
+    return {"status": "online", "message": "Smart Bytes Financial Backend is running", "endpoints": ["/tasas", "/api/rates", "/api/rates/stats", "/api/rates/spread", "/ready", "/docs"]}
+
+@app.get("/ready", summary="Estado de preparación del servicio", tags=["Info"])
+def readiness_check():
+    """
+    Readiness probe: 200 cuando las dependencias pesadas ya están cargadas, 503 mientras tanto.
+    """
+    content = {
+        **readiness,
+        "upstreams": {"bcv": bcv_guard.snapshot(), "binance_p2p": binance_guard.snapshot()}
+    }
+    return JSONResponse(status_code=200 if readiness["ready"] else 503, content=content)
 
 # --- Funciones de Scraping y Lógica de Negocio ---
 
+def _get_bcv_page(headers: dict):
+    import requests
+
+    response = requests.get(BCV_URL, headers=headers, timeout=15, verify=False)
+    response.raise_for_status()
+    return response
+
 def scrape_bcv_rates():
     """
     Realiza el scraping de la página del BCV para obtener las tasas USD y EUR.
     """
+    from bs4 import BeautifulSoup
+
     try:
         headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/100.0.4896.127 Safari/537.36'
         }
         
         print(f"Iniciando scraping a {BCV_URL}...")
-        response = requests.get(BCV_URL, headers=headers, timeout=15, verify=False)
-        response.raise_for_status() 
+        response = bcv_guard.call(_get_bcv_page, headers)
 
         soup = BeautifulSoup(response.content, 'html.parser')
 
@@ -173,6 +268,9 @@ def scrape_bcv_rates():
             "date": datetime.now().isoformat()
         }
 
+    except UpstreamUnavailableError as e:
+        print(f"Scraping BCV omitido: {e}")
+        raise HTTPException(status_code=503, detail="BCV temporalmente no disponible.")
     except Exception as e:
         print(f"Error al procesar la respuesta del BCV: {e}")
         raise HTTPException(status_code=500, detail="Error al procesar los datos del BCV.")
@@ -196,8 +294,7 @@ def get_rates_with_cache():
     time_difference = now - rates_cache["last_updated"]
     cache_expired = time_difference.total_seconds() > (rates_cache["cache_duration_hours"] * 3600)
     
-    update_hours = [6, 19, 20, 21]
-    is_update_window = now.hour in update_hours
+    is_update_window = now.hour in BCV_UPDATE_HOURS
 
     if cache_expired or is_update_window or rates_cache["USD"] is None:
         try:
@@ -208,7 +305,7 @@ def get_rates_with_cache():
             
             try:
                 # Guardar en DB local (Original)
-                save_rates(
+                get_database().save_rates(
                     usd_bcv=new_rates["USD"],
                     eur_bcv=new_rates["EUR"],
                     usd_binance_buy=None,
@@ -222,7 +319,8 @@ def get_rates_with_cache():
             except Exception as db_error:
                 print(f"Error guardando en BD (continuando con caché): {db_error}")
             
-            return {**new_rates, "status": "SCRAPED_AND_UPDATED"}
+            # `date` = last_updated, igual que en las respuestas servidas desde caché
+            return {**new_rates, "date": now.isoformat(), "status": "SCRAPED_AND_UPDATED"}
         except HTTPException as e:
             if rates_cache["USD"] is not None:
                 print(f"Scraping fallido ({e.detail}). Sirviendo caché antigua.")
@@ -256,15 +354,15 @@ async def update_rates_job():
         
         # Scrape Binance rates
         try:
-            precios_compra = obtener_precios_p2p("BUY")
-            precios_venta = obtener_precios_p2p("SELL")
-            
-            promedio_compra = calcular_promedio(precios_compra)
-            promedio_venta = calcular_promedio(precios_venta)
+            # Mismo estimador robusto que publica /p2p/promedio-usdt-ves
+            await loop.run_in_executor(None, lambda: agregador_p2p.refrescar(forzar=True))
+            estimacion = await loop.run_in_executor(None, agregador_p2p.estimar, ESTIMADOR_PUBLICADO.value)
+            promedio_compra = estimacion["BUY"]["valor"]
+            promedio_venta = estimacion["SELL"]["valor"]
             
             if promedio_compra > 0 and promedio_venta > 0:
                 # Guardar DB local
-                save_rates(
+                get_database().save_rates(
                     usd_bcv=result.get('USD', 0),
                     eur_bcv=result.get('EUR', 0),
                     usd_binance_buy=promedio_compra,
@@ -293,6 +391,11 @@ async def startup_event():
     Al iniciar la aplicación, realiza un scraping inicial y configura el scheduler.
     """
     print("Iniciando la aplicación. Modo Cliente Pasivo activado.")
+
+    # Precarga en segundo plano: el puerto queda abierto de inmediato y /ready
+    # responde 200 cuando la BD y el scraper están listos.
+    global _warm_up_future
+    _warm_up_future = asyncio.get_event_loop().run_in_executor(None, warm_up)
     # try:
         # --- MIGRACIÓN ---
         # Desactivando scraping inicial. El sistema ahora es "Passive Client".
@@ -312,8 +415,10 @@ async def startup_event():
     # Esto previene conflictos de escritura y duplicidad de scraping.
 
     # Start scheduler
-    # scheduler.add_job(update_rates_job, trigger=CronTrigger(hour=6, minute=0, timezone=VENEZUELA_TZ), ...)
-    # scheduler.start()
+    # import pytz
+    # from apscheduler.triggers.cron import CronTrigger
+    # get_scheduler().add_job(update_rates_job, trigger=CronTrigger(hour=6, minute=0, timezone=pytz.timezone('America/Caracas')), ...)
+    # get_scheduler().start()
     
     print(f"[SYSTEM] Scheduler interno desactivado. Leyendo tasas de base de datos externa.")
 
@@ -322,57 +427,181 @@ async def shutdown_event():
     """
     Detener el scheduler al cerrar la aplicación
     """
-    if scheduler.running:
+    if scheduler is not None and scheduler.running:
         scheduler.shutdown()
     print("[SCHEDULER] Scheduler detenido")
 
+def rates_cache_ttl_seconds() -> int:
+    return int(rates_cache["cache_duration_hours"] * 3600)
+
+def seconds_until_bcv_update(now: datetime) -> int:
+    """
+    Segundos hasta el inicio de la próxima hora de BCV_UPDATE_HOURS (hora local del servidor)
+    """
+    next_hour = now.replace(minute=0, second=0, microsecond=0)
+    for _ in range(24):
+        next_hour += timedelta(hours=1)
+        if next_hour.hour in BCV_UPDATE_HOURS:
+            break
+    return max(0, int((next_hour - now).total_seconds()))
+
+def rates_cache_max_age() -> int:
+    """
+    Segundos que le quedan a la caché de tasas (0 en ventana de actualización del BCV),
+    sin pasar del inicio de la próxima ventana: ahí el BCV puede publicar otra tasa
+    """
+    now = datetime.now()
+    if now.hour in BCV_UPDATE_HOURS:
+        return 0
+    age = (now - rates_cache["last_updated"]).total_seconds()
+    remaining = max(0, int(rates_cache_ttl_seconds() - age))
+    return min(remaining, seconds_until_bcv_update(now))
+
+def rates_cache_stale_while_revalidate(max_age: int) -> int:
+    """stale-while-revalidate de /tasas: tampoco se extiende más allá de la próxima ventana del BCV"""
+    until_update = seconds_until_bcv_update(datetime.now())
+    return max(0, min(rates_cache_ttl_seconds(), until_update - max_age))
+
+def rates_snapshot_key(data: dict) -> tuple:
+    """
+    Identidad de un snapshot de tasas para el ETag: fecha más valores, sin `status` ni `source`.
+    Acepta la forma de la BD (usd_bcv, last_updated...) y la del scraper (USD, EUR, date).
+    """
+    return (
+        data.get("last_updated") or data.get("date"),
+        data.get("usd_bcv", data.get("USD")),
+        data.get("eur_bcv", data.get("EUR")),
+        data.get("usd_binance_buy"),
+        data.get("usd_binance_sell"),
+    )
+
 @app.get("/tasas", summary="Obtener la tasa de USD y EUR del BCV", tags=["Tasas"])
-async def get_bcv_exchange_rates():
+async def get_bcv_exchange_rates(request: Request):
     loop = asyncio.get_event_loop()
     result = await loop.run_in_executor(None, get_rates_with_cache)
-    return result
+    # El ETag identifica el snapshot de tasas; `status` no entra en el hash
+    max_age = rates_cache_max_age()
+    return tasas_response_cache.respond(
+        request, result,
+        key=rates_snapshot_key(result),
+        max_age=max_age,
+        stale_while_revalidate=rates_cache_stale_while_revalidate(max_age)
+    )
 
 @app.get("/api/rates", summary="Obtener tasas desde base de datos", tags=["Tasas"])
-async def get_rates_api():
-    db_rates = get_rates_dict()
+async def get_rates_api(request: Request):
+    result = await load_rates_api_payload()
+    # Igual que /tasas: `source` y `status` no cambian el ETag si las tasas son las mismas
+    return rates_api_response_cache.respond(
+        request, result,
+        key=rates_snapshot_key(result["data"]),
+        max_age=RATES_API_MAX_AGE,
+        stale_while_revalidate=rates_cache_ttl_seconds()
+    )
+
+async def load_rates_api_payload():
+    """
+    Tasas desde la BD (Supabase/SQLite) con fallback al scraper del BCV
+    """
+    loop = asyncio.get_event_loop()
+    db_rates = await loop.run_in_executor(None, lambda: get_database().get_rates_dict())
     if db_rates:
         return {"success": True, "data": db_rates, "source": "database"}
     
     print("No hay datos en BD, intentando scraping...")
     try:
-        loop = asyncio.get_event_loop()
         result = await loop.run_in_executor(None, get_rates_with_cache)
         return {"success": True, "data": result, "source": "scraper_fallback"}
     except Exception as e:
         raise HTTPException(status_code=503, detail=f"No se pudieron obtener las tasas: {str(e)}")
 
+def get_rate_history():
+    """Historial columnar de tasas (importa NumPy y carga la tabla en el primer uso)"""
+    get_database()
+    from rate_history import rate_history
+    rate_history.ensure_loaded()
+    return rate_history
+
+def build_rate_stats(series: str, days: int) -> dict:
+    history = get_rate_history()
+    return {
+        "series": series,
+        "days": days,
+        "rows": len(history),
+        "daily_change": history.daily_change(series, days),
+        "volatility": history.volatility(series, days),
+        "bcv_binance_spread": history.bcv_binance_spread(days)
+    }
+
+@app.get("/api/rates/stats", summary="Estadísticas del historial de tasas", tags=["Tasas"])
+async def get_rates_stats(
+    series: str = Query("usd_bcv", pattern="^(usd_bcv|eur_bcv|usd_binance_buy|usd_binance_sell)$"),
+    days: int = Query(30, ge=1, le=3650)
+):
+    """
+    Variación diaria, volatilidad y brecha BCV vs Binance calculadas sobre el historial en memoria.
+    """
+    loop = asyncio.get_event_loop()
+    return await loop.run_in_executor(None, build_rate_stats, series, days)
+
+# Respuestas de /api/rates/spread por (ventana, puntos), con la misma cota que los payloads
+spread_response_caches = LRUCache(SPREAD_CACHE_SIZE)
+
+def get_spread_tracker():
+    """Spread BCV vs Binance: consume las filas nuevas del historial (de cualquier proceso)"""
+    from spread_analytics import spread_tracker
+    spread_tracker.sync(get_rate_history())
+    return spread_tracker
+
+@app.get("/api/rates/spread", summary="Brecha BCV vs Binance y compra vs venta", tags=["Tasas"])
+async def get_rates_spread(
+    request: Request,
+    window: str = Query("24h", pattern="^(1h|24h|7d|30d)$"),
+    points: int = Query(100, ge=1, le=1000)
+):
+    """
+    Brecha oficial vs paralelo (BCV vs promedio Binance) y compra vs venta en Binance:
+    valor actual, promedios móviles por ventana, histórico muestreado y alertas por umbral.
+    """
+    loop = asyncio.get_event_loop()
+    payload = await loop.run_in_executor(None, lambda: get_spread_tracker().payload(window, points))
+    cache = spread_response_caches.get_or_create((window, points), SnapshotResponseCache)
+    return cache.respond(
+        request, payload,
+        max_age=RATES_API_MAX_AGE,
+        stale_while_revalidate=rates_cache_ttl_seconds()
+    )
+
 class PromedioPrecios(BaseModel):
     promedio_compra_ves: float
     promedio_venta_ves: float
     anuncios_contabilizados_compra: int
     anuncios_contabilizados_venta: int
+    estimador: str = ESTIMADOR_PUBLICADO.value
+    ultimo_snapshot: Optional[datetime] = None
 
 @app.get("/p2p/promedio-usdt-ves", response_model=PromedioPrecios, summary="Obtener promedio P2P Binance", tags=["Tasas"])
-async def get_promedios_p2p():
+async def get_promedios_p2p(
+    estimador: Estimador = Query(
+        ESTIMADOR_PUBLICADO,
+        description="media, mediana, media_mad (media sin outliers por MAD), vwap o ewma sobre la ventana móvil de snapshots"
+    )
+):
+    # La ventana solo consulta Binance cuando el último snapshot venció (P2P_REFRESH_SECONDS)
     loop = asyncio.get_event_loop()
-    precios_compra = await loop.run_in_executor(None, obtener_precios_p2p, 'BUY')
-    precios_venta = await loop.run_in_executor(None, obtener_precios_p2p, 'SELL')
-    
-    promedio_compra = calcular_promedio(precios_compra)
-    promedio_venta = calcular_promedio(precios_venta)
+    resultado = await loop.run_in_executor(None, agregador_p2p.estimar, estimador.value)
     
     return PromedioPrecios(
-        promedio_compra_ves=round(promedio_compra, 4),
-        promedio_venta_ves=round(promedio_venta, 4),
-        anuncios_contabilizados_compra=len(precios_compra),
-        anuncios_contabilizados_venta=len(precios_venta)
-
+        promedio_compra_ves=round(resultado["BUY"]["valor"], 4),
+        promedio_venta_ves=round(resultado["SELL"]["valor"], 4),
+        anuncios_contabilizados_compra=resultado["BUY"]["anuncios"],
+        anuncios_contabilizados_venta=resultado["SELL"]["anuncios"],
+        estimador=estimador.value,
+        ultimo_snapshot=resultado["ultimo_snapshot"]
     )
 
 # --- Transaction Endpoints ---
 
-from database import Transaction, SessionLocal
-from typing import List, Optional
 import uuid
 
 class TransactionCreate(BaseModel):
@@ -409,10 +638,12 @@ def generate_transaction_code(type_prefix: str, db_id: int):
 
 @app.post("/transactions/", response_model=TransactionResponse, summary="Crear nueva transacción", tags=["Transacciones"])
 async def create_transaction(transaction: TransactionCreate):
-    db = SessionLocal()
+    # Fuera del event loop: durante el arranque warm_up() puede tener tomado _database_lock
+    database = await asyncio.get_event_loop().run_in_executor(None, get_database)
+    db = database.SessionLocal()
     try:
         # Create base record
-        db_transaction = Transaction(
+        db_transaction = database.Transaction(
             type=transaction.type,
             amount=transaction.amount,
             currency=transaction.currency,
@@ -439,7 +670,14 @@ async def create_transaction(transaction: TransactionCreate):
 
 @app.get("/transactions/", response_model=List[TransactionResponse], summary="Listar historial de transacciones", tags=["Transacciones"])
 async def get_transactions(type: Optional[str] = None, status: Optional[str] = None):
-    db = SessionLocal()
+    database = await asyncio.get_event_loop().run_in_executor(None, get_database)
+    if fast_json.ENABLED:
+        # Ruta rápida: filas por columnas + encoder C, sin validar cada fila con Pydantic.
+        # El schema OpenAPI sigue saliendo de response_model.
+        return fast_json.FastJSONResponse(database.list_transaction_rows(type, status))
+
+    Transaction = database.Transaction
+    db = database.SessionLocal()
     try:
         query = db.query(Transaction)
         if type:
@@ -455,7 +693,7 @@ async def get_transactions(type: Optional[str] = None, status: Optional[str] = N
 async def force_refresh_rates():
     try:
         await update_rates_job()
-        return await get_rates_api()
+        return await load_rates_api_payload()
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al forzar actualización: {str(e)}")
 
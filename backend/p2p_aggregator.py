@@ -0,0 +1,262 @@
+"""
+Agregación robusta de precios P2P (USDT/VES)
+Mantiene una ventana móvil de los últimos snapshots de Binance P2P en un ring buffer
+de tamaño fijo y calcula mediana, media filtrada por MAD, VWAP y EWMA sin re-consultar
+Binance en cada petición.
+"""
+import os
+import threading
+import time
+from bisect import bisect_left, insort
+from datetime import datetime
+from enum import Enum
+from typing import Callable, Optional
+
+from binance_scraper import obtener_anuncios_p2p
+
+# Snapshots que cubre la ventana y anuncios por snapshot (página de 10 sin el patrocinado)
+P2P_WINDOW_SNAPSHOTS = int(os.getenv("P2P_WINDOW_SNAPSHOTS", "10"))
+P2P_ADS_PER_SNAPSHOT = 9
+# Segundos que se reutiliza el último snapshot antes de volver a consultar Binance
+P2P_REFRESH_SECONDS = float(os.getenv("P2P_REFRESH_SECONDS", "60"))
+P2P_EWMA_ALPHA = float(os.getenv("P2P_EWMA_ALPHA", "0.3"))
+# Edad máxima de un anuncio en la ventana: si el endpoint se consulta poco, los precios
+# viejos salen por tiempo y no solo al llegar anuncios nuevos
+P2P_MAX_AGE_SECONDS = float(os.getenv("P2P_MAX_AGE_SECONDS", str(P2P_WINDOW_SNAPSHOTS * P2P_REFRESH_SECONDS)))
+# Un anuncio es outlier si se aleja más de k * MAD escalada de la mediana
+P2P_MAD_K = float(os.getenv("P2P_MAD_K", "3.0"))
+
+# Factor de consistencia: MAD * 1.4826 estima la desviación estándar en datos normales
+MAD_SCALE = 1.4826
+
+class Estimador(str, Enum):
+    media = "media"
+    mediana = "mediana"
+    media_mad = "media_mad"
+    vwap = "vwap"
+    ewma = "ewma"
+
+ESTIMADORES = tuple(e.value for e in Estimador)
+# Estimador por defecto del endpoint y el que se guarda en la base de datos
+ESTIMADOR_PUBLICADO = Estimador.media_mad
+
+
+def _mediana_ordenada(valores: list) -> float:
+    n = len(valores)
+    mitad = n // 2
+    if n % 2:
+        return valores[mitad]
+    return (valores[mitad - 1] + valores[mitad]) / 2
+
+
+class VentanaP2P:
+    """
+    Ring buffer de (precio, cantidad, instante) con estimadores incrementales.
+
+    Cada anuncio nuevo actualiza las sumas de media y VWAP en O(1) y se inserta en una
+    lista ordenada (búsqueda O(log W) y desplazamiento acotado por la capacidad W), así
+    la mediana se lee en O(1). La EWMA se actualiza en O(1) por snapshot con la mediana
+    del snapshot. La media MAD se calcula sobre la ventana y se guarda hasta el próximo cambio.
+    `expirar` saca por el inicio del buffer los anuncios más viejos que un instante dado.
+    """
+
+    def __init__(self, capacidad: int, alpha: float = P2P_EWMA_ALPHA, k: float = P2P_MAD_K):
+        if capacidad <= 0:
+            raise ValueError("La capacidad de la ventana debe ser positiva")
+        self.capacidad = capacidad
+        self.alpha = alpha
+        self.k = k
+        self._precios = [0.0] * capacidad
+        self._cantidades = [0.0] * capacidad
+        self._instantes = [0.0] * capacidad
+        self._inicio = 0
+        self._total = 0
+        self._ordenados = []
+        self._suma_precios = 0.0
+        self._suma_pq = 0.0
+        self._suma_q = 0.0
+        self._ewma: Optional[float] = None
+        self._media_mad: Optional[tuple] = None
+        self.snapshots = 0
+        self.ultimo_snapshot: Optional[datetime] = None
+
+    def __len__(self):
+        return self._total
+
+    def _quitar_mas_antiguo(self):
+        viejo_p = self._precios[self._inicio]
+        viejo_q = self._cantidades[self._inicio]
+        self._suma_precios -= viejo_p
+        self._suma_pq -= viejo_p * viejo_q
+        self._suma_q -= viejo_q
+        del self._ordenados[bisect_left(self._ordenados, viejo_p)]
+        self._inicio = (self._inicio + 1) % self.capacidad
+        self._total -= 1
+
+    def _push(self, precio: float, cantidad: float, instante: float):
+        if self._total == self.capacidad:
+            # Ventana llena: sale el anuncio más antiguo
+            self._quitar_mas_antiguo()
+        posicion = (self._inicio + self._total) % self.capacidad
+        self._total += 1
+
+        self._precios[posicion] = precio
+        self._cantidades[posicion] = cantidad
+        self._instantes[posicion] = instante
+        self._suma_precios += precio
+        self._suma_pq += precio * cantidad
+        self._suma_q += cantidad
+        insort(self._ordenados, precio)
+
+        if posicion == self.capacidad - 1:
+            self._recalcular_sumas()
+
+    def _recalcular_sumas(self):
+        # Una vez por vuelta del buffer (O(1) amortizado) para que no se acumule error de redondeo
+        precios = [self._precios[(self._inicio + i) % self.capacidad] for i in range(self._total)]
+        cantidades = [self._cantidades[(self._inicio + i) % self.capacidad] for i in range(self._total)]
+        self._suma_precios = sum(precios)
+        self._suma_pq = sum(p * q for p, q in zip(precios, cantidades))
+        self._suma_q = sum(cantidades)
+
+    def expirar(self, limite: float) -> int:
+        """
+        Saca de la ventana los anuncios agregados antes de `limite` (reloj time.monotonic).
+        :return: Cantidad de anuncios eliminados.
+        """
+        eliminados = 0
+        while self._total and self._instantes[self._inicio] < limite:
+            self._quitar_mas_antiguo()
+            eliminados += 1
+        if eliminados:
+            self._media_mad = None
+            if not self._total:
+                # Ventana vacía: nada de lo anterior debe seguir influyendo
+                self._suma_precios = self._suma_pq = self._suma_q = 0.0
+                self._ewma = None
+        return eliminados
+
+    def push_snapshot(self, anuncios: list, instante: float = None):
+        """
+        Agrega un snapshot de Binance a la ventana.
+        :param anuncios: Lista de tuplas (precio, cantidad) tal como las devuelve obtener_anuncios_p2p.
+        :param instante: Momento del snapshot (time.monotonic); por defecto, ahora.
+        """
+        anuncios = [(p, q) for p, q in anuncios if p > 0]
+        if not anuncios:
+            return
+        instante = time.monotonic() if instante is None else instante
+        for precio, cantidad in anuncios:
+            self._push(precio, cantidad, instante)
+
+        mediana_snapshot = _mediana_ordenada(sorted(p for p, _ in anuncios))
+        if self._ewma is None:
+            self._ewma = mediana_snapshot
+        else:
+            self._ewma = self.alpha * mediana_snapshot + (1 - self.alpha) * self._ewma
+        self._media_mad = None
+        self.snapshots += 1
+        self.ultimo_snapshot = datetime.utcnow()
+
+    # --- Estimadores: devuelven (valor, anuncios usados) ---
+
+    def media(self) -> tuple:
+        if not self._total:
+            return 0.0, 0
+        return self._suma_precios / self._total, self._total
+
+    def mediana(self) -> tuple:
+        if not self._total:
+            return 0.0, 0
+        return _mediana_ordenada(self._ordenados), self._total
+
+    def media_mad(self) -> tuple:
+        """Media de los anuncios a menos de k * MAD escalada de la mediana"""
+        if not self._total:
+            return 0.0, 0
+        if self._media_mad is None:
+            mediana = _mediana_ordenada(self._ordenados)
+            mad = _mediana_ordenada(sorted(abs(p - mediana) for p in self._ordenados)) * MAD_SCALE
+            limite = self.k * mad
+            validos = [p for p in self._ordenados if abs(p - mediana) <= limite] or self._ordenados
+            self._media_mad = (sum(validos) / len(validos), len(validos))
+        return self._media_mad
+
+    def vwap(self) -> tuple:
+        """Precio medio ponderado por la cantidad disponible de cada anuncio"""
+        if not self._total:
+            return 0.0, 0
+        if self._suma_q <= 0:
+            return self.media()
+        return self._suma_pq / self._suma_q, self._total
+
+    def ewma(self) -> tuple:
+        if self._ewma is None:
+            return 0.0, 0
+        return self._ewma, self._total
+
+    def estimar(self, estimador: str) -> tuple:
+        if estimador not in ESTIMADORES:
+            raise ValueError(f"Estimador desconocido: {estimador}")
+        return getattr(self, estimador)()
+
+
+class AgregadorP2P:
+    """
+    Ventanas BUY/SELL con refresco perezoso: solo se consulta Binance cuando el último
+    snapshot tiene más de `refresh_seconds`. Un único hilo consulta a la vez; el resto
+    sigue sirviendo la ventana existente en lugar de esperar a Binance.
+    """
+
+    def __init__(self, fetch: Callable[[str], list] = obtener_anuncios_p2p,
+                 snapshots: int = P2P_WINDOW_SNAPSHOTS, refresh_seconds: float = P2P_REFRESH_SECONDS,
+                 max_age_seconds: float = P2P_MAX_AGE_SECONDS):
+        capacidad = max(1, snapshots) * P2P_ADS_PER_SNAPSHOT
+        self.fetch = fetch
+        self.refresh_seconds = refresh_seconds
+        self.max_age_seconds = max_age_seconds
+        self.ventanas = {"BUY": VentanaP2P(capacidad), "SELL": VentanaP2P(capacidad)}
+        self._ultimo_refresco = None
+        self._lock = threading.Lock()
+        self._fetch_lock = threading.Lock()
+
+    def _necesita_refresco(self) -> bool:
+        return self._ultimo_refresco is None or time.monotonic() - self._ultimo_refresco >= self.refresh_seconds
+
+    def refrescar(self, forzar: bool = False):
+        """Consulta Binance y agrega un snapshot por lado si la ventana está vencida"""
+        if not forzar and not self._necesita_refresco():
+            return
+        # Solo se espera al otro hilo si todavía no hay ningún dato que servir
+        if not self._fetch_lock.acquire(blocking=self._ultimo_refresco is None):
+            return
+        try:
+            if not forzar and not self._necesita_refresco():
+                return
+            snapshots = {trade_type: self.fetch(trade_type) for trade_type in self.ventanas}
+            with self._lock:
+                for trade_type, anuncios in snapshots.items():
+                    self.ventanas[trade_type].push_snapshot(anuncios)
+                # Aunque Binance falle se espera refresh_seconds: se sirve la ventana existente
+                self._ultimo_refresco = time.monotonic()
+        finally:
+            self._fetch_lock.release()
+
+    def estimar(self, estimador: str) -> dict:
+        """
+        :return: dict con el valor y los anuncios usados por lado (BUY/SELL) y la hora del último snapshot
+        """
+        self.refrescar()
+        resultado = {}
+        limite = time.monotonic() - self.max_age_seconds
+        with self._lock:
+            for trade_type, ventana in self.ventanas.items():
+                ventana.expirar(limite)
+                valor, usados = ventana.estimar(estimador)
+                resultado[trade_type] = {"valor": valor, "anuncios": usados}
+            resultado["ultimo_snapshot"] = self.ventanas["BUY"].ultimo_snapshot
+        return resultado
+
+
+# Instancia compartida por la API
+agregador_p2p = AgregadorP2P()
@@ -0,0 +1,327 @@
+"""
+Compact in-process history of exchange rates
+Columnar copy of the `exchange_rates` table: timestamps as int64 epoch seconds and each
+rate series as float64 (NaN for missing values), about 40 bytes per row instead of a full
+ORM object. Loaded lazily in chunks, kept up to date from the table (rows written by any
+process) and optionally backed by a memory-mapped file that several workers can share.
+"""
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+from array import array
+from datetime import datetime, timezone
+
+import numpy as np
+from sqlalchemy import select
+
+import database
+from database import ExchangeRate
+
+SERIES = ("usd_bcv", "eur_bcv", "usd_binance_buy", "usd_binance_sell")
+
+RATE_HISTORY_CHUNK_SIZE = int(os.getenv("RATE_HISTORY_CHUNK_SIZE", "5000"))
+# Archivo compartido entre workers (opcional). Vacío = solo memoria del proceso.
+RATE_HISTORY_MMAP_PATH = os.getenv("RATE_HISTORY_MMAP_PATH", "")
+# Cada cuánto una lectura vuelve a mirar la tabla (y el archivo) por filas nuevas de otros procesos
+RATE_HISTORY_REFRESH_SECONDS = float(os.getenv("RATE_HISTORY_REFRESH_SECONDS", "30"))
+
+# Venezuela usa UTC-4 fijo (sin horario de verano): los días se cortan a medianoche de Caracas
+CARACAS_OFFSET_SECONDS = -4 * 3600
+SECONDS_PER_DAY = 86400
+
+# Formato del archivo: cabecera de 64 bytes + columna ts + una columna por serie
+_FILE_MAGIC = b"SBRH"
+_FILE_VERSION = 1
+_HEADER = struct.Struct("<4sIqqI")
+_HEADER_SIZE = 64
+
+
+def _to_epoch(value: datetime) -> int:
+    """last_updated se guarda como UTC naive (datetime.utcnow)"""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return int(value.timestamp())
+
+
+def _to_float(value) -> float:
+    return math.nan if value is None else float(value)
+
+
+class RateHistory:
+    """
+    Columnar rate history.
+
+    Rows come from two parts: an optional read-only `base` mapped from
+    RATE_HISTORY_MMAP_PATH (shared pages across workers) and an in-process `tail` of
+    `array` columns for rows newer than the file. Statistics run vectorized with NumPy
+    over the concatenation.
+
+    Reads older than `refresh_seconds` first pick up rows saved by other processes: a newer
+    shared file is remapped, the table is read from the last id on (keyset) and the file
+    is rewritten when rows were added.
+    """
+
+    def __init__(self, mmap_path: str = RATE_HISTORY_MMAP_PATH, chunk_size: int = RATE_HISTORY_CHUNK_SIZE,
+                 refresh_seconds: float = RATE_HISTORY_REFRESH_SECONDS):
+        self.mmap_path = mmap_path
+        self.chunk_size = chunk_size
+        self.refresh_seconds = refresh_seconds
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._checked_at = 0.0
+        self._last_id = 0
+        self._base_ts = np.empty(0, dtype=np.int64)
+        self._base_series = {name: np.empty(0, dtype=np.float64) for name in SERIES}
+        self._mmap = None
+        self._tail_ts = array("q")
+        self._tail_series = {name: array("d") for name in SERIES}
+
+    def __len__(self):
+        with self._lock:
+            return len(self._base_ts) + len(self._tail_ts)
+
+    @property
+    def last_id(self) -> int:
+        return self._last_id
+
+    # --- Carga ---
+
+    def ensure_loaded(self):
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            self._sync()
+            self._loaded = True
+
+    def refresh(self, force: bool = False):
+        """Pick up rows saved since the last check (at most once per `refresh_seconds` unless forced)"""
+        if not force and time.monotonic() - self._checked_at < self.refresh_seconds:
+            return
+        with self._lock:
+            if not force and time.monotonic() - self._checked_at < self.refresh_seconds:
+                return
+            self._sync()
+
+    def _sync(self):
+        # Otro worker pudo dejar un archivo más nuevo: se mapea en lugar de releer esas filas
+        if self.mmap_path and self._file_last_id(self.mmap_path) > self._last_id:
+            self._map_file(self.mmap_path)
+        new_rows = self.load_new_rows()
+        if self.mmap_path and new_rows:
+            self.persist()
+        self._checked_at = time.monotonic()
+
+    def load_new_rows(self) -> int:
+        """
+        Read rows with id > last loaded id from `exchange_rates` in chunks (keyset pagination)
+
+        Returns:
+            Number of rows appended
+        """
+        columns = [ExchangeRate.id, ExchangeRate.last_updated] + [getattr(ExchangeRate, name) for name in SERIES]
+        appended = 0
+        with self._lock, database.engine.connect() as conn:
+            while True:
+                stmt = (select(*columns)
+                        .where(ExchangeRate.id > self._last_id)
+                        .order_by(ExchangeRate.id)
+                        .limit(self.chunk_size))
+                rows = conn.execute(stmt).all()
+                for row in rows:
+                    self._append(row[0], row[1], row[2:])
+                appended += len(rows)
+                if len(rows) < self.chunk_size:
+                    return appended
+
+    def _append(self, row_id: int, last_updated: datetime, values):
+        self._tail_ts.append(_to_epoch(last_updated))
+        for name, value in zip(SERIES, values):
+            self._tail_series[name].append(_to_float(value))
+        self._last_id = row_id
+
+    def on_rate_saved(self, rate):
+        """database rate listener: read the new rows (this save and any other writer's) if already loaded"""
+        with self._lock:
+            # Sin cargar aún: la fila entrará con la carga perezosa
+            if self._loaded and rate.id > self._last_id:
+                self._sync()
+
+    # --- Archivo mapeado en memoria ---
+
+    @staticmethod
+    def _file_last_id(path: str) -> int:
+        """Last row id recorded in the header of `path` (0 if missing or unknown format)"""
+        try:
+            with open(path, "rb") as f:
+                header = f.read(_HEADER.size)
+        except OSError:
+            return 0
+        if len(header) < _HEADER.size:
+            return 0
+        magic, version, _, last_id, n_series = _HEADER.unpack(header)
+        if magic != _FILE_MAGIC or version != _FILE_VERSION or n_series != len(SERIES):
+            return 0
+        return last_id
+
+    def _map_file(self, path: str):
+        with open(path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, count, last_id, n_series = _HEADER.unpack_from(mm, 0)
+        if magic != _FILE_MAGIC or version != _FILE_VERSION or n_series != len(SERIES):
+            mm.close()
+            print(f"⚠️  Rate history file {path} has an unknown format; ignoring it")
+            return
+        offset = _HEADER_SIZE
+        self._base_ts = np.frombuffer(mm, dtype=np.int64, count=count, offset=offset)
+        offset += count * 8
+        for name in SERIES:
+            self._base_series[name] = np.frombuffer(mm, dtype=np.float64, count=count, offset=offset)
+            offset += count * 8
+        # El archivo incluye todas las filas hasta last_id, también las que estaban en el tail
+        self._tail_ts = array("q")
+        self._tail_series = {name: array("d") for name in SERIES}
+        self._mmap = mm
+        self._last_id = last_id
+
+    def persist(self, path: str = None):
+        """
+        Write the whole history to `path` (atomic replace) and map it as the new base
+        """
+        path = path or self.mmap_path
+        if not path:
+            raise ValueError("No rate history file configured (RATE_HISTORY_MMAP_PATH)")
+        with self._lock:
+            ts, series = self._columns()
+            header = _HEADER.pack(_FILE_MAGIC, _FILE_VERSION, len(ts), self._last_id, len(SERIES))
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(header.ljust(_HEADER_SIZE, b"\0"))
+                f.write(ts.tobytes())
+                for name in SERIES:
+                    f.write(series[name].tobytes())
+            os.replace(tmp_path, path)
+            self._map_file(path)
+
+    # --- Columnas ---
+
+    def _columns(self) -> tuple:
+        """NumPy copies of (timestamps, {series: values}) covering base + tail"""
+        with self._lock:
+            ts = np.concatenate([self._base_ts, np.frombuffer(self._tail_ts, dtype=np.int64)])
+            series = {
+                name: np.concatenate([self._base_series[name], np.frombuffer(self._tail_series[name], dtype=np.float64)])
+                for name in SERIES
+            }
+        return ts, series
+
+    def columns(self) -> tuple:
+        self.ensure_loaded()
+        self.refresh()
+        return self._columns()
+
+    def rows_since(self, start: int) -> tuple:
+        """
+        Rows from position `start` on, for incremental consumers
+
+        Returns:
+            (timestamps, {series: values}, position to pass on the next call)
+        """
+        self.ensure_loaded()
+        self.refresh()
+        with self._lock:
+            n_base = len(self._base_ts)
+            tail_start = max(0, start - n_base)
+            ts = np.concatenate([self._base_ts[start:], np.frombuffer(self._tail_ts, dtype=np.int64)[tail_start:]])
+            series = {
+                name: np.concatenate([self._base_series[name][start:],
+                                      np.frombuffer(self._tail_series[name], dtype=np.float64)[tail_start:]])
+                for name in SERIES
+            }
+            return ts, series, n_base + len(self._tail_ts)
+
+    # --- Estadísticas ---
+
+    @staticmethod
+    def _daily_closes(ts: np.ndarray, values: np.ndarray) -> tuple:
+        """Last valid value of each Caracas calendar day -> (day numbers, closes)"""
+        valid = ~np.isnan(values)
+        ts, values = ts[valid], values[valid]
+        if not len(ts):
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+        days = (ts + CARACAS_OFFSET_SECONDS) // SECONDS_PER_DAY
+        last_of_day = np.flatnonzero(np.diff(days) != 0)
+        last_of_day = np.append(last_of_day, len(days) - 1)
+        return days[last_of_day], values[last_of_day]
+
+    def daily_change(self, series: str = "usd_bcv", days: int = 30) -> list:
+        """
+        Daily close and percentage change versus the previous close for the last `days` days
+        """
+        if series not in SERIES:
+            raise ValueError(f"Unknown series: {series}")
+        ts, columns = self.columns()
+        day_numbers, closes = self._daily_closes(ts, columns[series])
+        if not len(closes):
+            return []
+        changes = np.full(len(closes), np.nan)
+        changes[1:] = (closes[1:] / closes[:-1] - 1) * 100
+        start = max(0, len(closes) - days)
+        return [
+            {
+                "date": datetime.fromtimestamp(int(day) * SECONDS_PER_DAY, tz=timezone.utc).date().isoformat(),
+                "close": round(float(close), 4),
+                "change_pct": None if np.isnan(change) else round(float(change), 4),
+            }
+            for day, close, change in zip(day_numbers[start:], closes[start:], changes[start:])
+        ]
+
+    def volatility(self, series: str = "usd_bcv", days: int = 30) -> dict:
+        """
+        Standard deviation of daily log returns over the last `days` daily closes
+        """
+        if series not in SERIES:
+            raise ValueError(f"Unknown series: {series}")
+        ts, columns = self.columns()
+        _, closes = self._daily_closes(ts, columns[series])
+        closes = closes[-(days + 1):]
+        closes = closes[closes > 0]
+        if len(closes) < 3:
+            return {"daily_pct": None, "annualized_pct": None, "observations": max(0, len(closes) - 1)}
+        returns = np.diff(np.log(closes))
+        daily = float(np.std(returns, ddof=1))
+        return {
+            "daily_pct": round(daily * 100, 4),
+            "annualized_pct": round(daily * math.sqrt(365) * 100, 4),
+            "observations": len(returns),
+        }
+
+    def bcv_binance_spread(self, days: int = None) -> dict:
+        """
+        Gap between the Binance P2P mid price and the official BCV USD rate, in percent
+        """
+        ts, columns = self.columns()
+        bcv = columns["usd_bcv"]
+        mid = (columns["usd_binance_buy"] + columns["usd_binance_sell"]) / 2
+        valid = ~np.isnan(mid) & (bcv > 0)
+        if days is not None and len(ts):
+            valid &= ts >= ts[-1] - days * SECONDS_PER_DAY
+        if not valid.any():
+            return {"current_pct": None, "mean_pct": None, "min_pct": None, "max_pct": None, "observations": 0}
+        gap = (mid[valid] / bcv[valid] - 1) * 100
+        return {
+            "current_pct": round(float(gap[-1]), 4),
+            "mean_pct": round(float(gap.mean()), 4),
+            "min_pct": round(float(gap.min()), 4),
+            "max_pct": round(float(gap.max()), 4),
+            "observations": int(gap.size),
+        }
+
+
+# Instancia compartida: se carga en el primer uso y se sincroniza en cada save_rates
+rate_history = RateHistory()
+database.add_rate_listener(rate_history.on_rate_saved)
@@ -0,0 +1,184 @@
+"""
+Upstream resilience: circuit breaker and token-bucket rate limiter
+Used in front of the BCV and Binance P2P scrapers so that an upstream outage fails
+fast instead of tying up executor threads until the request timeout.
+"""
+import os
+import threading
+import time
+from collections import deque
+
+
+class UpstreamUnavailableError(Exception):
+    """The call was rejected locally without contacting the upstream"""
+
+
+class CircuitOpenError(UpstreamUnavailableError):
+    pass
+
+
+class RateLimitedError(UpstreamUnavailableError):
+    pass
+
+
+class TokenBucket:
+    """
+    Token bucket: `rate` tokens per second up to `capacity` (burst).
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def try_acquire(self, tokens: float = 1.0) -> bool:
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return True
+            return False
+
+
+class CircuitBreaker:
+    """
+    Failure-rate circuit breaker (closed -> open -> half-open -> closed).
+
+    Closed: calls pass; the last `window_size` outcomes are kept and the circuit opens when
+    at least `min_calls` were recorded and the failure rate reaches `failure_rate_threshold`.
+    Open: calls are rejected for `open_seconds`.
+    Half-open: up to `half_open_max_calls` trial calls pass; a success closes the circuit,
+    a failure opens it again.
+    """
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_rate_threshold: float = 0.5, window_size: int = 10,
+                 min_calls: int = 4, open_seconds: float = 60.0, half_open_max_calls: int = 1):
+        self.name = name
+        self.failure_rate_threshold = failure_rate_threshold
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        self.half_open_max_calls = half_open_max_calls
+        self._outcomes = deque(maxlen=window_size)
+        self._state = self.CLOSED
+        self._opened_at = 0.0
+        self._half_open_calls = 0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._maybe_half_open()
+            return self._state
+
+    def _maybe_half_open(self):
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+            self._state = self.HALF_OPEN
+            self._half_open_calls = 0
+
+    def _open(self):
+        self._state = self.OPEN
+        self._opened_at = time.monotonic()
+        print(f"⚠️  [CIRCUIT] {self.name}: circuito ABIERTO por {self.open_seconds:.0f}s")
+
+    def allow(self) -> bool:
+        """Reserve permission for one call; must be followed by record_success/record_failure"""
+        with self._lock:
+            self._maybe_half_open()
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.HALF_OPEN and self._half_open_calls < self.half_open_max_calls:
+                self._half_open_calls += 1
+                return True
+            return False
+
+    def release(self):
+        """Give back a permission from `allow` for a call that was never made"""
+        with self._lock:
+            if self._state == self.HALF_OPEN and self._half_open_calls > 0:
+                self._half_open_calls -= 1
+
+    def record_success(self):
+        with self._lock:
+            if self._state == self.HALF_OPEN:
+                self._state = self.CLOSED
+                self._outcomes.clear()
+                print(f"✅ [CIRCUIT] {self.name}: circuito CERRADO")
+                return
+            self._outcomes.append(True)
+
+    def record_failure(self):
+        with self._lock:
+            if self._state == self.HALF_OPEN:
+                self._open()
+                return
+            if self._state == self.OPEN:
+                return
+            self._outcomes.append(False)
+            failures = self._outcomes.count(False)
+            if len(self._outcomes) >= self.min_calls and failures / len(self._outcomes) >= self.failure_rate_threshold:
+                self._open()
+
+    def snapshot(self) -> dict:
+        state = self.state
+        with self._lock:
+            failures = self._outcomes.count(False)
+            return {"state": state, "recent_calls": len(self._outcomes), "recent_failures": failures}
+
+
+class UpstreamGuard:
+    """
+    Rate limiter + circuit breaker for one upstream.
+
+    Usage:
+        response = bcv_guard.call(fetch_page, url)
+
+    Raises RateLimitedError or CircuitOpenError immediately when the call is not allowed.
+    Any exception raised by `fn` is recorded as a failure and re-raised.
+    """
+
+    def __init__(self, name: str, breaker: CircuitBreaker, limiter: TokenBucket):
+        self.name = name
+        self.breaker = breaker
+        self.limiter = limiter
+
+    @classmethod
+    def from_env(cls, name: str, prefix: str, rate_per_minute: float, burst: float) -> "UpstreamGuard":
+        """Build a guard whose limits can be overridden with <PREFIX>_* environment variables"""
+        breaker = CircuitBreaker(
+            name,
+            failure_rate_threshold=float(os.getenv(f"{prefix}_FAILURE_RATE", "0.5")),
+            window_size=int(os.getenv(f"{prefix}_FAILURE_WINDOW", "10")),
+            min_calls=int(os.getenv(f"{prefix}_MIN_CALLS", "4")),
+            open_seconds=float(os.getenv(f"{prefix}_OPEN_SECONDS", "60")),
+        )
+        limiter = TokenBucket(
+            rate=float(os.getenv(f"{prefix}_RATE_PER_MINUTE", str(rate_per_minute))) / 60.0,
+            capacity=float(os.getenv(f"{prefix}_BURST", str(burst))),
+        )
+        return cls(name, breaker, limiter)
+
+    def call(self, fn, *args, **kwargs):
+        # El circuito decide primero: solo las llamadas que sí salen consumen un token
+        if not self.breaker.allow():
+            raise CircuitOpenError(f"{self.name}: circuito abierto")
+        if not self.limiter.try_acquire():
+            # Sin token la prueba de half-open no se hizo: se devuelve el turno
+            self.breaker.release()
+            raise RateLimitedError(f"{self.name}: límite de peticiones alcanzado")
+        try:
+            result = fn(*args, **kwargs)
+        except Exception:
+            self.breaker.record_failure()
+            raise
+        self.breaker.record_success()
+        return result
+
+    def snapshot(self) -> dict:
+        return {"circuit": self.breaker.snapshot()}
@@ -0,0 +1,144 @@
+"""
+HTTP response caching for the rate endpoints
+Serializes each rate snapshot to JSON once, derives an ETag (strong from the bytes, or
+weak from a snapshot key) and answers If-None-Match with 304 so browsers and CDNs can
+revalidate without a body.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Callable, Optional
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+
+import fast_json
+
+
+def cache_control_header(max_age: int, stale_while_revalidate: int) -> str:
+    """Build the Cache-Control value shared by the rate endpoints"""
+    return f"public, max-age={max(0, int(max_age))}, stale-while-revalidate={max(0, int(stale_while_revalidate))}"
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Weak comparison of an If-None-Match header against `etag` (RFC 9110 §13.1.2)
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    if etag.startswith("W/"):
+        etag = etag[2:]
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+class SnapshotResponseCache:
+    """
+    Keeps the serialized body and ETag of the last payload served by one endpoint.
+
+    The payload is rebuilt from the rate snapshot on every request, but it is only
+    re-serialized when it differs from the previous one. The ETag is derived from
+    `key` when given (e.g. last_updated plus values), so fields that do not change the
+    rates, like a cache status, do not change the ETag; since different bodies then share
+    it, that ETag is weak (W/"...", RFC 9110 §8.8.1). Otherwise it is a strong hash of
+    the body bytes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._payload = None
+        self._body: Optional[bytes] = None
+        self._key = None
+        self._etag: Optional[str] = None
+
+    @staticmethod
+    def _hash(data: bytes) -> str:
+        return f'"{hashlib.sha256(data).hexdigest()[:32]}"'
+
+    def serialize(self, payload, key=None) -> tuple:
+        """
+        Returns:
+            (body bytes, ETag) for `payload`, reusing the cached ones when unchanged
+        """
+        with self._lock:
+            if self._body is not None and payload == self._payload and key == self._key:
+                return self._body, self._etag
+
+        body = fast_json.dumps(jsonable_encoder(payload))
+        if key is None:
+            etag = self._hash(body)
+        else:
+            etag = "W/" + self._hash(fast_json.dumps(jsonable_encoder(key)))
+
+        with self._lock:
+            self._payload = payload
+            self._body = body
+            self._key = key
+            self._etag = etag
+        return body, etag
+
+    def respond(self, request: Request, payload, max_age: int, stale_while_revalidate: int, key=None) -> Response:
+        """
+        Build the response for `payload`: 304 when the client already has it, 200 otherwise
+        """
+        body, etag = self.serialize(payload, key)
+        headers = {
+            "ETag": etag,
+            "Cache-Control": cache_control_header(max_age, stale_while_revalidate),
+        }
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+        return Response(content=body, media_type="application/json", headers=headers)
+
+
+class LRUCache:
+    """
+    Thread-safe mapping that keeps at most `maxsize` entries, evicting the least recently used.
+    For endpoints whose payload depends on query parameters (one entry per parameter set).
+    """
+
+    def __init__(self, maxsize: int):
+        if maxsize <= 0:
+            raise ValueError("maxsize must be positive")
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._entries:
+                return default
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def get_or_create(self, key, factory: Callable):
+        """Entry for `key`, created with `factory()` if missing"""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+            value = self._entries[key] = factory()
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+            return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
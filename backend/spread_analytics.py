@@ -0,0 +1,178 @@
+"""
+BCV vs Binance spread analytics
+Tracks the official-vs-parallel gap (BCV USD vs Binance P2P mid price) and the Binance
+buy-vs-sell gap incrementally from the in-process rate history, with rolling averages
+per time window and alert thresholds. Payloads are cached per (window, points) in a
+bounded LRU until the next row arrives.
+"""
+import math
+import os
+import threading
+from collections import deque
+from datetime import datetime, timezone
+from typing import Optional
+
+from response_cache import LRUCache
+
+# Ventanas móviles, relativas a la última observación
+WINDOWS = {
+    "1h": 3600,
+    "24h": 86400,
+    "7d": 7 * 86400,
+    "30d": 30 * 86400,
+}
+
+METRICS = ("official_parallel_abs", "official_parallel_pct", "buy_sell_abs", "buy_sell_pct")
+
+# Umbrales de alerta (en %)
+SPREAD_ALERT_PCT = float(os.getenv("SPREAD_ALERT_PCT", "10"))
+SPREAD_BUY_SELL_ALERT_PCT = float(os.getenv("SPREAD_BUY_SELL_ALERT_PCT", "2"))
+# Payloads distintos (ventana, puntos) que se guardan a la vez
+SPREAD_CACHE_SIZE = int(os.getenv("SPREAD_CACHE_SIZE", "32"))
+
+
+def compute_spread(usd_bcv, usd_binance_buy, usd_binance_sell) -> Optional[dict]:
+    """
+    Spread metrics of one rate row, or None if it lacks BCV or Binance values
+    """
+    values = (usd_bcv, usd_binance_buy, usd_binance_sell)
+    if any(v is None or (isinstance(v, float) and math.isnan(v)) or v <= 0 for v in values):
+        return None
+    mid = (usd_binance_buy + usd_binance_sell) / 2
+    return {
+        "usd_bcv": usd_bcv,
+        "binance_mid": mid,
+        "official_parallel_abs": mid - usd_bcv,
+        "official_parallel_pct": (mid / usd_bcv - 1) * 100,
+        "buy_sell_abs": usd_binance_buy - usd_binance_sell,
+        "buy_sell_pct": (usd_binance_buy / usd_binance_sell - 1) * 100,
+    }
+
+
+class _RollingWindow:
+    """Time window with running sums: O(1) amortized per added observation"""
+
+    def __init__(self, seconds: int):
+        self.seconds = seconds
+        self.points = deque()
+        self.sums = dict.fromkeys(METRICS, 0.0)
+
+    def add(self, ts: int, metrics: dict):
+        self.points.append((ts, metrics))
+        for name in METRICS:
+            self.sums[name] += metrics[name]
+        cutoff = ts - self.seconds
+        while self.points and self.points[0][0] < cutoff:
+            _, old = self.points.popleft()
+            for name in METRICS:
+                self.sums[name] -= old[name]
+
+    def averages(self) -> dict:
+        n = len(self.points)
+        result = {f"avg_{name}": (round(self.sums[name] / n, 4) if n else None) for name in METRICS}
+        result["observations"] = n
+        return result
+
+
+class SpreadTracker:
+    """
+    Incremental spread state fed from a RateHistory: each `sync` consumes only the rows
+    added since the previous one, so rows saved by any process are picked up and reads
+    never scan the table.
+    """
+
+    def __init__(self, cache_size: int = SPREAD_CACHE_SIZE):
+        self._lock = threading.Lock()
+        # Filas del historial ya consumidas (posición, no id)
+        self._consumed = 0
+        self._windows = {name: _RollingWindow(seconds) for name, seconds in WINDOWS.items()}
+        self._current = None
+        # Payloads por (ventana, puntos); se vacía con cada fila nueva
+        self._cache = LRUCache(cache_size)
+
+    def sync(self, history):
+        """Add the rows of `history` not seen yet (older than the 30-day window are skipped)"""
+        with self._lock:
+            ts, columns, self._consumed = history.rows_since(self._consumed)
+            if not len(ts):
+                return
+            start = ts[-1] - max(WINDOWS.values())
+            for i in (ts >= start).nonzero()[0]:
+                self._add(int(ts[i]), float(columns["usd_bcv"][i]),
+                          float(columns["usd_binance_buy"][i]), float(columns["usd_binance_sell"][i]))
+
+    def _add(self, ts: int, usd_bcv, usd_binance_buy, usd_binance_sell):
+        metrics = compute_spread(usd_bcv, usd_binance_buy, usd_binance_sell)
+        if metrics is None:
+            return
+        for window in self._windows.values():
+            window.add(ts, metrics)
+        self._current = (ts, metrics)
+        self._cache.clear()
+
+    def _alerts(self, metrics: dict) -> list:
+        checks = (
+            ("official_parallel_pct", SPREAD_ALERT_PCT),
+            ("buy_sell_pct", SPREAD_BUY_SELL_ALERT_PCT),
+        )
+        return [
+            {
+                "metric": name,
+                "value": round(metrics[name], 4),
+                "threshold_pct": threshold,
+                "triggered": abs(metrics[name]) >= threshold,
+            }
+            for name, threshold in checks
+        ]
+
+    def payload(self, window: str, points: int) -> dict:
+        """
+        Response body for `window`; the same dict object is returned until a new row arrives
+        or the entry is evicted from the LRU
+        """
+        if window not in WINDOWS:
+            raise ValueError(f"Unknown window: {window}")
+        with self._lock:
+            key = (window, points)
+            cached = self._cache.get(key)
+            if cached is not None:
+                return cached
+
+            current = None
+            alerts = []
+            if self._current is not None:
+                ts, metrics = self._current
+                current = {"timestamp": datetime.fromtimestamp(ts, tz=timezone.utc).isoformat()}
+                current.update({name: round(value, 4) for name, value in metrics.items()})
+                alerts = self._alerts(metrics)
+
+            series = list(self._windows[window].points)
+            if len(series) > points:
+                # Muestreo uniforme que siempre incluye el primer y el último punto
+                if points == 1:
+                    series = series[-1:]
+                else:
+                    last = len(series) - 1
+                    series = [series[round(i * last / (points - 1))] for i in range(points)]
+            history = [
+                {
+                    "timestamp": datetime.fromtimestamp(ts, tz=timezone.utc).isoformat(),
+                    "official_parallel_pct": round(metrics["official_parallel_pct"], 4),
+                    "buy_sell_pct": round(metrics["buy_sell_pct"], 4),
+                }
+                for ts, metrics in series
+            ]
+
+            result = {
+                "window": window,
+                "current": current,
+                "rolling": {name: w.averages() for name, w in self._windows.items()},
+                "history": history,
+                "alerts": alerts,
+            }
+            self._cache.put(key, result)
+            return result
+
+
+# Instancia compartida por la API
+spread_tracker = SpreadTracker()
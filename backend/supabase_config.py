@@ -3,8 +3,10 @@ Supabase Configuration Module
 Handles connection to Supabase for exchange rates persistence
 """
 import os
-from supabase import create_client, Client
-from typing import Optional
+from typing import Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from supabase import Client
 
 # Supabase credentials from environment variables
 SUPABASE_URL = os.getenv("SUPABASE_URL", "")
@@ -14,9 +16,9 @@ SUPABASE_SERVICE_KEY = os.getenv("SUPABASE_SERVICE_KEY", "")
 RAILWAY_RATES_ID = "00000000-0000-0000-0000-000000000001"
 
 # Supabase client instance (singleton)
-_supabase_client: Optional[Client] = None
+_supabase_client: Optional["Client"] = None
 
-def get_supabase_client() -> Optional[Client]:
+def get_supabase_client() -> Optional["Client"]:
     """
     Get or create Supabase client instance
     Returns None if credentials are not configured
@@ -33,6 +35,8 @@ def get_supabase_client() -> Optional[Client]:
         return None
     
     try:
+        # Import diferido: la librería supabase es pesada y solo se usa si hay credenciales
+        from supabase import create_client
         _supabase_client = create_client(SUPABASE_URL, SUPABASE_SERVICE_KEY)
         print("✅ Supabase client initialized successfully")
         return _supabase_client